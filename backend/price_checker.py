@@ -1,29 +1,51 @@
 # price_checker.py
 import os
+import queue
+import threading
 import time
 import traceback
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from urllib.parse import urlparse
 
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
-# Firebase
-import firebase_admin
-from firebase_admin import credentials, firestore
+from price_parser import (
+    normalize_price_text,
+    extract_flipkart_data_from_soup,
+    extract_amazon_data_from_soup,
+    parse_page,
+)
 
 load_dotenv()
 
-# Write firebase file if provided
-if os.environ.get("FIREBASE_CREDENTIALS"):
-    with open("serviceAccountKey.json", "w", encoding="utf-8") as f:
-        f.write(os.environ["FIREBASE_CREDENTIALS"])
+# Firebase is set up lazily (see init_firebase) rather than at import time:
+# spawned parse workers re-import this module as __mp_main__ and must not
+# rewrite the credentials file or open their own Firestore client.
+db = None
+firestore = None
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
+def init_firebase():
+    global db, firestore
+    if db is not None:
+        return db
+    import firebase_admin
+    from firebase_admin import credentials, firestore as _firestore
 
-db = firestore.client()
+    # Write firebase file if provided
+    if os.environ.get("FIREBASE_CREDENTIALS"):
+        with open("serviceAccountKey.json", "w", encoding="utf-8") as f:
+            f.write(os.environ["FIREBASE_CREDENTIALS"])
+
+    if not firebase_admin._apps:
+        cred = credentials.Certificate("serviceAccountKey.json")
+        firebase_admin.initialize_app(cred)
+
+    firestore = _firestore
+    db = firestore.client()
+    return db
 
 TELEGRAM_BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN", "")
 DEFAULT_USER_AGENT = os.environ.get("DEFAULT_USER_AGENT", "Mozilla/5.0")
@@ -34,6 +56,16 @@ SMTP_USERNAME = os.environ.get("SMTP_USERNAME")
 SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
 EMAIL_FROM = os.environ.get("EMAIL_FROM", "no-reply@example.com")
 BACKEND_URL = os.environ.get("BACKEND_URL", "")
+# fetch/parse pipeline tuning
+FETCH_WORKERS = max(1, int(os.environ.get("FETCH_WORKERS", 4)))
+# sched_getaffinity honours container cpusets; cpu_count reports the host
+_AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+# with the per-host delay, fetch rate rather than parsing is the usual limit, so
+# don't spawn more parsers than fetchers unless asked to
+PARSE_WORKERS = max(1, int(os.environ.get("PARSE_WORKERS", min(_AVAILABLE_CPUS, FETCH_WORKERS))))
+PARSE_QUEUE_SIZE = max(1, int(os.environ.get("PARSE_QUEUE_SIZE", PARSE_WORKERS * 2)))
+# minimum seconds between requests to the same host, shared by all fetch threads
+FETCH_HOST_DELAY = float(os.environ.get("FETCH_HOST_DELAY", 2))
 
 # helper functions reused from backend
 def safe_requests_get(url, headers=None, timeout=15):
@@ -49,94 +81,31 @@ def safe_requests_get(url, headers=None, timeout=15):
             time.sleep(2 * (i+1))
     return None
 
-def normalize_price_text(price_text):
-    if not price_text:
-        return None
-    s = ''.join(ch for ch in price_text if (ch.isdigit() or ch == '.' or ch == ','))
-    s = s.replace(',', '')
-    digits = ''.join(ch for ch in s if ch.isdigit() or ch == '.')
-    if not digits:
-        return None
-    if digits.count('.') > 1:
-        digits = digits.split('.')[0]
+def playwright_scrape_price(url):
     try:
-        return float(digits)
-    except:
-        return None
-
-def extract_flipkart_data_from_soup(soup):
-    price_selectors = [
-        "div._30jeq3", "div._1vC4OE", "div._1_WHN1", "div._25b18c",
-        "span._30jeq3", "div._16Jk6d"
-    ]
-    title_selectors = ["span.B_NuCI", "h1._1AtVbE", "span._35KyD6", "h1"]
-    price = None
-    title = None
-    for sel in price_selectors:
-        tag = soup.select_one(sel)
-        if tag:
-            price = normalize_price_text(tag.get_text(strip=True))
-            if price:
-                break
-    for sel in title_selectors:
-        tag = soup.select_one(sel)
-        if tag:
-            title = tag.get_text(strip=True)[:200]
-            break
-    return price, title
-
-def extract_amazon_data_from_soup(soup):
-    price_selectors = [
-        "#priceblock_ourprice", "#priceblock_dealprice",
-        ".a-price .a-offscreen", "#price_inside_buybox", ".a-offscreen"
-    ]
-    title_selectors = ["#productTitle", "h1#title", "span#productTitle", "h1"]
-    price = None
-    title = None
-    for sel in price_selectors:
-        tag = soup.select_one(sel)
-        if tag:
-            price = normalize_price_text(tag.get_text(strip=True))
-            if price:
-                break
-    for sel in title_selectors:
-        tag = soup.select_one(sel)
-        if tag:
-            title = tag.get_text(strip=True)[:200]
-            break
-    return price, title
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as pw:
+            browser = pw.chromium.launch(headless=True)
+            page = browser.new_page()
+            page.goto(url, timeout=30000)
+            html = page.content()
+            p, t = parse_page(url, html)
+            browser.close()
+            if p:
+                return p, t
+    except Exception as e:
+        print("Playwright fallback error:", e)
+    return None, None
 
 def safe_scrape_price(url):
     resp = safe_requests_get(url)
     if resp:
-        soup = BeautifulSoup(resp.content, "lxml")
-        url_low = url.lower()
-        if "flipkart.com" in url_low:
-            p, t = extract_flipkart_data_from_soup(soup)
-        else:
-            p, t = extract_amazon_data_from_soup(soup)
+        p, t = parse_page(url, resp.content)
         if p:
             return p, t
     # Playwright fallback
     if USE_PLAYWRIGHT:
-        try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as pw:
-                browser = pw.chromium.launch(headless=True)
-                page = browser.new_page()
-                page.goto(url, timeout=30000)
-                html = page.content()
-                soup = BeautifulSoup(html, "lxml")
-                url_low = url.lower()
-                if "flipkart.com" in url_low:
-                    p, t = extract_flipkart_data_from_soup(soup)
-                else:
-                    p, t = extract_amazon_data_from_soup(soup)
-                browser.close()
-                if p:
-                    return p, t
-        except Exception as e:
-            print("Playwright fallback error:", e)
+        return playwright_scrape_price(url)
     return None, None
 
 def send_telegram_message(chat_id, message):
@@ -175,19 +144,27 @@ def send_email(to_email, subject, html_body):
         print("Email send error:", e)
         return False
 
+def is_valid_item(data, doc_id):
+    if not data.get("product_url") or not data.get("alert_price") or not data.get("telegram_id"):
+        print(f"Skipping invalid tracked item {doc_id}")
+        return False
+    return True
+
 def process_item(doc_snapshot, doc_id):
+    init_firebase()
     data = doc_snapshot.to_dict()
+    if not is_valid_item(data, doc_id):
+        return False, None
+    url = data.get("product_url")
+    print(f"Checking {url} for target {data.get('alert_price')}")
+    current_price, title = safe_scrape_price(url)
+    return record_price(doc_id, data, current_price, title)
+
+def record_price(doc_id, data, current_price, title):
     url = data.get("product_url")
     alert_price = data.get("alert_price")
     telegram_id = data.get("telegram_id")
     email = data.get("email")
-    if not url or not alert_price or not telegram_id:
-        print(f"Skipping invalid tracked item {doc_id}")
-        return False, None
-
-    print(f"Checking {url} for target {alert_price}")
-
-    current_price, title = safe_scrape_price(url)
     if current_price is None:
         print("Could not extract price for", url)
         return False, None
@@ -243,22 +220,158 @@ def process_item(doc_snapshot, doc_id):
         print(f"No alert. Current: {current_price}, Target: {alert_price}")
     return False, current_price
 
-def main():
-    print("Starting price checker")
+# --- fetch/parse pipeline ---
+# Fetch threads download pages and push raw bytes onto a bounded queue; the main
+# thread feeds them to a process pool for parsing (BeautifulSoup + selectors are
+# CPU bound, so threads would serialize on the GIL). Parse results go to a
+# recorder thread that does the Playwright fallback, Firestore writes and alerts,
+# so slow network calls there never stall fetching or parsing. A full page queue
+# blocks the fetchers and a semaphore caps pages in flight in the pool, giving
+# back-pressure in both directions.
+_DONE = object()
+_FAILED = object()  # doc raised while fetching; not counted as checked, like the old loop
+
+class HostRateLimiter:
+    def __init__(self, delay):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_allowed = {}
+
+    def wait(self, url):
+        if self.delay <= 0:
+            return
+        host = urlparse(url).netloc.lower()
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_allowed.get(host, now))
+            self.next_allowed[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+def fetch_stage(docs_iter, docs_lock, out_queue, limiter, errors):
     try:
-        docs = db.collection("tracked_items").where("active", "==", True).stream()
-        checked = 0
-        alerts = 0
-        for d in docs:
+        while True:
+            try:
+                with docs_lock:
+                    d = next(docs_iter, None)
+            except Exception as e:
+                # the doc stream itself failed; stop this run and let run_pipeline report it
+                print("Error reading tracked items:", e)
+                errors.append(e)
+                break
+            if d is None:
+                break
             try:
-                ok, price = process_item(d, d.id)
-                checked += 1
-                if ok:
-                    alerts += 1
-                time.sleep(2)  # polite delay
+                data = d.to_dict()
+                if not is_valid_item(data, d.id):
+                    out_queue.put((d.id, None, None))
+                    continue
+                url = data.get("product_url")
+                print(f"Checking {url} for target {data.get('alert_price')}")
+                limiter.wait(url)
+                resp = safe_requests_get(url)
+                out_queue.put((d.id, data, resp.content if resp else None))
             except Exception as e:
-                print("Error processing doc:", e)
+                print("Error fetching doc:", e)
                 traceback.print_exc()
+                out_queue.put((d.id, _FAILED, None))
+    finally:
+        out_queue.put(_DONE)
+
+def finish_item(doc_id, data, price, title):
+    url = data.get("product_url")
+    if not price and USE_PLAYWRIGHT:
+        price, title = playwright_scrape_price(url)
+    if not price:
+        price, title = None, None
+    return record_price(doc_id, data, price, title)
+
+def record_stage(results, counts):
+    while True:
+        item = results.get()
+        if item is _DONE:
+            break
+        doc_id, data, price, title = item
+        if data is _FAILED:
+            continue
+        if data is None:
+            counts["checked"] += 1
+            continue
+        try:
+            ok, _ = finish_item(doc_id, data, price, title)
+            counts["checked"] += 1
+            if ok:
+                counts["alerts"] += 1
+        except Exception as e:
+            print("Error processing doc:", e)
+            traceback.print_exc()
+
+def run_pipeline(docs, fetch_workers=FETCH_WORKERS, parse_workers=PARSE_WORKERS,
+                 queue_size=PARSE_QUEUE_SIZE, host_delay=FETCH_HOST_DELAY):
+    counts = {"checked": 0, "alerts": 0}
+    errors = []
+    pages = queue.Queue(maxsize=queue_size)
+    results = queue.Queue()
+    in_flight = threading.Semaphore(queue_size)
+
+    def on_parsed(fut, doc_id, data):
+        in_flight.release()
+        try:
+            price, title = fut.result()
+        except Exception as e:
+            print("Parse error for", data.get("product_url"), e)
+            price, title = None, None
+        results.put((doc_id, data, price, title))
+
+    # Workers start lazily on the first submit, after the fetch/recorder (and
+    # Firebase gRPC) threads exist, so use spawn rather than fork: a fresh
+    # interpreter inherits none of their locks. Spawn re-imports the main script
+    # as __mp_main__; that import is side-effect free (Firebase is lazy, main()
+    # is __main__-guarded), so workers load only modules, not clients.
+    pool = ProcessPoolExecutor(max_workers=parse_workers,
+                               mp_context=multiprocessing.get_context("spawn"))
+    recorder = threading.Thread(target=record_stage, args=(results, counts), daemon=True)
+    recorder.start()
+    try:
+        docs_iter = iter(docs)
+        docs_lock = threading.Lock()
+        limiter = HostRateLimiter(host_delay)
+        fetchers = [
+            threading.Thread(target=fetch_stage,
+                             args=(docs_iter, docs_lock, pages, limiter, errors), daemon=True)
+            for _ in range(fetch_workers)
+        ]
+        for t in fetchers:
+            t.start()
+
+        running = len(fetchers)
+        while running:
+            item = pages.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            doc_id, data, content = item
+            if data is None or data is _FAILED or content is None:
+                # invalid item, errored doc or failed fetch; nothing to parse
+                results.put((doc_id, data, None, None))
+                continue
+            in_flight.acquire()
+            fut = pool.submit(parse_page, data.get("product_url"), content)
+            fut.add_done_callback(lambda f, doc_id=doc_id, data=data: on_parsed(f, doc_id, data))
+    finally:
+        pool.shutdown(wait=True)
+        results.put(_DONE)
+    recorder.join()
+    if errors:
+        raise RuntimeError(f"Price check run failed after {counts['checked']} items: {errors[0]}") from errors[0]
+    return counts["checked"], counts["alerts"]
+
+def main():
+    print("Starting price checker")
+    try:
+        db = init_firebase()
+        docs = db.collection("tracked_items").where("active", "==", True).stream()
+        checked, alerts = run_pipeline(docs)
         print(f"Checked: {checked}, Alerts: {alerts}")
     except Exception as e:
         print("Main loop error:", e)
@@ -0,0 +1,70 @@
+# price_parser.py
+# HTML parsing helpers for the price checker. Kept free of Firebase/env setup so
+# parse worker processes can import it cheaply (once per worker) and run
+# parse_page on raw response bytes.
+from bs4 import BeautifulSoup
+
+
+def normalize_price_text(price_text):
+    if not price_text:
+        return None
+    s = ''.join(ch for ch in price_text if (ch.isdigit() or ch == '.' or ch == ','))
+    s = s.replace(',', '')
+    digits = ''.join(ch for ch in s if ch.isdigit() or ch == '.')
+    if not digits:
+        return None
+    if digits.count('.') > 1:
+        digits = digits.split('.')[0]
+    try:
+        return float(digits)
+    except:
+        return None
+
+def extract_flipkart_data_from_soup(soup):
+    price_selectors = [
+        "div._30jeq3", "div._1vC4OE", "div._1_WHN1", "div._25b18c",
+        "span._30jeq3", "div._16Jk6d"
+    ]
+    title_selectors = ["span.B_NuCI", "h1._1AtVbE", "span._35KyD6", "h1"]
+    price = None
+    title = None
+    for sel in price_selectors:
+        tag = soup.select_one(sel)
+        if tag:
+            price = normalize_price_text(tag.get_text(strip=True))
+            if price:
+                break
+    for sel in title_selectors:
+        tag = soup.select_one(sel)
+        if tag:
+            title = tag.get_text(strip=True)[:200]
+            break
+    return price, title
+
+def extract_amazon_data_from_soup(soup):
+    price_selectors = [
+        "#priceblock_ourprice", "#priceblock_dealprice",
+        ".a-price .a-offscreen", "#price_inside_buybox", ".a-offscreen"
+    ]
+    title_selectors = ["#productTitle", "h1#title", "span#productTitle", "h1"]
+    price = None
+    title = None
+    for sel in price_selectors:
+        tag = soup.select_one(sel)
+        if tag:
+            price = normalize_price_text(tag.get_text(strip=True))
+            if price:
+                break
+    for sel in title_selectors:
+        tag = soup.select_one(sel)
+        if tag:
+            title = tag.get_text(strip=True)[:200]
+            break
+    return price, title
+
+def parse_page(url, content):
+    # content is raw bytes (or html str) so it pickles cheaply into worker processes
+    soup = BeautifulSoup(content, "lxml")
+    if "flipkart.com" in url.lower():
+        return extract_flipkart_data_from_soup(soup)
+    return extract_amazon_data_from_soup(soup)
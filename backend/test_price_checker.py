@@ -0,0 +1,125 @@
+# test_price_checker.py
+# Run from backend/: python -m unittest test_price_checker
+import types
+import unittest
+from unittest import mock
+
+from bs4 import BeautifulSoup
+
+import price_checker
+from price_parser import (
+    parse_page,
+    extract_amazon_data_from_soup,
+    extract_flipkart_data_from_soup,
+)
+
+AMAZON_HTML = b"""<html><body>
+<span id="productTitle">  Acme Kettle 1.5L  </span>
+<span class="a-price"><span class="a-offscreen">\xe2\x82\xb91,299.00</span></span>
+</body></html>"""
+
+FLIPKART_HTML = b"""<html><body>
+<span class="B_NuCI">Acme Phone (Blue, 128 GB)</span>
+<div class="_30jeq3">\xe2\x82\xb914,999</div>
+</body></html>"""
+
+ZERO_HTML = b"""<html><body><h1>Broken</h1><span class="a-offscreen">\xe2\x82\xb90</span></body></html>"""
+
+
+def fake_get(url):
+    if "fail" in url:
+        return None
+    if "flipkart.com" in url:
+        return types.SimpleNamespace(content=FLIPKART_HTML)
+    if "zero" in url:
+        return types.SimpleNamespace(content=ZERO_HTML)
+    return types.SimpleNamespace(content=AMAZON_HTML)
+
+
+class Doc:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def to_dict(self):
+        return self._data
+
+
+def item(url, alert_price):
+    return {"product_url": url, "alert_price": alert_price, "telegram_id": 1}
+
+
+class ParsePageTest(unittest.TestCase):
+    def test_matches_soup_extractors(self):
+        # same result as the pre-pipeline BeautifulSoup + extractor path
+        self.assertEqual(parse_page("https://www.amazon.in/dp/X", AMAZON_HTML),
+                         extract_amazon_data_from_soup(BeautifulSoup(AMAZON_HTML, "lxml")))
+        self.assertEqual(parse_page("https://www.flipkart.com/p/Y", FLIPKART_HTML),
+                         extract_flipkart_data_from_soup(BeautifulSoup(FLIPKART_HTML, "lxml")))
+
+    def test_extracted_values(self):
+        self.assertEqual(parse_page("https://www.amazon.in/dp/X", AMAZON_HTML),
+                         (1299.0, "Acme Kettle 1.5L"))
+        self.assertEqual(parse_page("https://www.flipkart.com/p/Y", FLIPKART_HTML),
+                         (14999.0, "Acme Phone (Blue, 128 GB)"))
+
+
+class RunPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.recorded = {}
+
+        def fake_record(doc_id, data, price, title):
+            self.recorded[doc_id] = price
+            if price is None:
+                return False, None
+            return price <= data["alert_price"], price
+
+        patches = [
+            mock.patch.object(price_checker, "safe_requests_get", fake_get),
+            mock.patch.object(price_checker, "record_price", fake_record),
+            mock.patch.object(price_checker, "USE_PLAYWRIGHT", False),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def run_docs(self, docs, **kw):
+        kw.setdefault("fetch_workers", 3)
+        kw.setdefault("parse_workers", 2)
+        kw.setdefault("queue_size", 2)
+        return price_checker.run_pipeline(docs, host_delay=0, **kw)
+
+    def test_counts_and_edge_paths(self):
+        docs = [Doc(f"ok{i}", item(f"https://www.amazon.in/dp/{i}", 2000 if i % 2 else 1000))
+                for i in range(20)]
+        docs += [
+            Doc("invalid", {"product_url": "https://www.amazon.in/dp/z"}),
+            Doc("failed", item("https://www.amazon.in/fail", 5000)),
+            Doc("zero", item("https://www.amazon.in/zero", 5000)),
+            Doc("crashed", None),  # to_dict() result unusable; errors in fetch_stage
+        ]
+        checked, alerts = self.run_docs(docs)
+        # more docs than queue_size; every doc but the crashed one counted, only odd ok-items alert
+        self.assertEqual(checked, len(docs) - 1)
+        self.assertEqual(alerts, 10)
+        self.assertNotIn("invalid", self.recorded)
+        self.assertNotIn("crashed", self.recorded)
+        self.assertIsNone(self.recorded["failed"])
+        # a 0 price is treated as "could not extract", not a price drop
+        self.assertIsNone(self.recorded["zero"])
+        self.assertEqual(self.recorded["ok0"], 1299.0)
+
+    def test_stream_error_fails_run(self):
+        def stream():
+            yield Doc("ok", item("https://www.amazon.in/dp/1", 1000))
+            raise TimeoutError("deadline exceeded")
+
+        with self.assertRaises(RuntimeError) as cm:
+            self.run_docs(stream())
+        self.assertIsInstance(cm.exception.__cause__, TimeoutError)
+        # the doc fetched before the failure was still parsed and recorded
+        self.assertEqual(self.recorded["ok"], 1299.0)
+
+
+if __name__ == "__main__":
+    unittest.main()